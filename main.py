@@ -6,6 +6,10 @@ Downloads Tidal tracks, albums, and playlists via SSH to a remote server
 
 import sys
 import re
+import select
+import shlex
+import time
+import uuid
 from pathlib import Path
 from typing import Optional, Dict, Any, List, Tuple
 
@@ -19,6 +23,15 @@ import logging
 
 console = Console()
 
+_CFG_OK_MARKER = "__TIDAL_CFG_OK__"
+
+
+# Single precompiled pattern covering every supported Tidal media type
+_TIDAL_RE = re.compile(
+    r'tidal\.com/(?:browse/)?'
+    r'(?:(track|album|video|artist)/(\d+)|playlist/([a-zA-Z0-9-]+))'
+)
+
 
 def parse_tidal_url(url: str) -> Tuple[str, str]:
     """
@@ -38,18 +51,11 @@ def parse_tidal_url(url: str) -> Tuple[str, str]:
     Returns:
         Tuple of (media_type, media_id)
     """
-    patterns = {
-        'track': r'tidal\.com/(?:browse/)?track/(\d+)',
-        'album': r'tidal\.com/(?:browse/)?album/(\d+)',
-        'playlist': r'tidal\.com/(?:browse/)?playlist/([a-zA-Z0-9-]+)',
-        'video': r'tidal\.com/(?:browse/)?video/(\d+)',
-        'artist': r'tidal\.com/(?:browse/)?artist/(\d+)',
-    }
-    
-    for media_type, pattern in patterns.items():
-        match = re.search(pattern, url)
-        if match:
-            return media_type, match.group(1)
+    match = _TIDAL_RE.search(url)
+    if match:
+        if match.group(1):
+            return match.group(1), match.group(2)
+        return 'playlist', match.group(3)
     
     # Try direct ID format
     if url.isdigit():
@@ -86,33 +92,84 @@ def create_ssh_client(host: str, username: str, port: int = 22,
         raise
 
 
-def execute_remote_command(client: paramiko.SSHClient, command: str) -> Tuple[str, str, int]:
-    """Execute command on remote server and return output"""
-    stdin, stdout, stderr = client.exec_command(command)
-    exit_status = stdout.channel.recv_exit_status()
+class SSHSession:
+    """Persistent remote shell reused for every short command on a connection"""
+    
+    def __init__(self, client: paramiko.SSHClient):
+        self.client = client
+        # exec'ing sh (rather than invoke_shell) gives a POSIX, non-login shell:
+        # no profile output, no PTY echo, and stdout/stderr stay separate
+        self.chan = client.get_transport().open_session()
+        self.chan.exec_command("exec /bin/sh")
     
-    return stdout.read().decode(), stderr.read().decode(), exit_status
+    def run(self, command: str, timeout: Optional[float] = 300) -> Tuple[str, str, int]:
+        """Run a command in the shared shell and return its output"""
+        marker = f"__END_{uuid.uuid4().hex}__".encode()
+        end_re = re.compile(re.escape(marker) + rb"(\d+)\n")
+        tail = len(marker) + 16
+        
+        # Each command runs in its own child sh so syntax errors, exit and cd stay
+        # contained; stdin is detached so it cannot consume the following requests
+        self.chan.sendall(
+            f"sh -c {shlex.quote(command)} </dev/null; ".encode()
+            + b'echo "' + marker + b'$?"; echo ' + marker + b" >&2\n"
+        )
+        
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        out, err = bytearray(), bytearray()
+        match = None
+        stderr_done = False
+        try:
+            while match is None or not stderr_done:
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError(f"Remote command timed out: {command}")
+                select.select([self.chan], [], [], 1.0)
+                if self.chan.recv_ready():
+                    out += self.chan.recv(65536)
+                    match = end_re.search(out, max(0, len(out) - tail))
+                if self.chan.recv_stderr_ready():
+                    err += self.chan.recv_stderr(65536)
+                    stderr_done = marker + b"\n" in err[-tail:]
+                if self.chan.exit_status_ready() and not (self.chan.recv_ready() or self.chan.recv_stderr_ready()):
+                    raise RuntimeError("Remote shell exited unexpectedly")
+        except BaseException:
+            # Unread output would leak into the next command, so start over
+            self.chan.close()
+            raise
+        
+        stdout = out[:match.start()].decode()
+        stderr = err[:err.rindex(marker)].decode()
+        return stdout, stderr, int(match.group(1))
+
+
+_sessions: Dict[int, SSHSession] = {}
+
+
+def get_ssh_session(client: paramiko.SSHClient) -> SSHSession:
+    """Return the shared shell session for a client, opening it on first use"""
+    session = _sessions.get(id(client))
+    if session is None or session.client is not client or session.chan.closed:
+        session = _sessions[id(client)] = SSHSession(client)
+    return session
+
+
+def execute_remote_command(client: paramiko.SSHClient, command: str,
+                           timeout: Optional[float] = 300) -> Tuple[str, str, int]:
+    """Execute command on remote server and return output"""
+    return get_ssh_session(client).run(command, timeout)
 
 
 def get_tidal_config(client: paramiko.SSHClient) -> Dict[str, Any]:
     """Retrieve current tidal-dl-ng configuration from settings.json"""
     import json
     
-    # Get the remote user's home directory
-    stdout, stderr, exit_status = execute_remote_command(client, "echo $HOME")
-    if exit_status != 0:
-        console.print(f"[red]Failed to get home directory: {stderr}[/red]")
-        return {}
-    
-    home_dir = stdout.strip()
-    config_path = f"{home_dir}/.config/tidal_dl_ng/settings.json"
-    
-    # Read the settings file
-    stdout, stderr, exit_status = execute_remote_command(client, f"cat '{config_path}'")
+    # Let the remote shell expand $HOME so the file is read in one round-trip
+    config_path = "$HOME/.config/tidal_dl_ng/settings.json"
+    stdout, stderr, exit_status = execute_remote_command(client, f'cat "{config_path}"')
     
     if exit_status != 0:
         console.print(f"[red]Failed to read config file: {stderr}[/red]")
-        console.print(f"[yellow]Config file may not exist at: {config_path}[/yellow]")
+        console.print("[yellow]Config file may not exist at ~/.config/tidal_dl_ng/settings.json on the remote host[/yellow]")
         return {}
     
     try:
@@ -123,16 +180,28 @@ def get_tidal_config(client: paramiko.SSHClient) -> Dict[str, Any]:
         return {}
 
 
-def set_tidal_config(client: paramiko.SSHClient, key: str, value: str) -> bool:
-    """Set a tidal-dl-ng configuration option"""
-    command = f'tidal-dl-ng cfg "{key}" "{value}"'
+def set_tidal_configs(client: paramiko.SSHClient, pairs: List[Tuple[str, str]]) -> bool:
+    """Set several tidal-dl-ng configuration options in a single remote command"""
+    # Each successful cfg call prints a marker on its own line so per-key
+    # results can be reported even if cfg output lacks a trailing newline
+    command = " && ".join(
+        f"tidal-dl-ng cfg {shlex.quote(key)} {shlex.quote(value)} && printf '\\n%s\\n' {_CFG_OK_MARKER}"
+        for key, value in pairs
+    )
     stdout, stderr, exit_status = execute_remote_command(client, command)
     
+    applied = sum(1 for line in stdout.splitlines() if line.strip() == _CFG_OK_MARKER)
+    for key, value in pairs[:applied]:
+        console.print(f"[green]Set {key} = {value}[/green]")
+    
     if exit_status != 0:
-        console.print(f"[red]Failed to set {key}: {stderr}[/red]")
+        if applied < len(pairs):
+            failed_key = pairs[applied][0]
+            console.print(f"[red]Failed to set {failed_key}: {stderr}[/red]")
+            for key, _ in pairs[applied + 1:]:
+                console.print(f"[yellow]Skipped {key}[/yellow]")
         return False
     
-    console.print(f"[green]Set {key} = {value}[/green]")
     return True
 
 
@@ -149,23 +218,35 @@ def download_tidal_content(client: paramiko.SSHClient, url: str,
         ) as progress:
             task = progress.add_task(f"Downloading from Tidal...", total=None)
             
-            stdin, stdout, stderr = client.exec_command(command)
+            chan = client.get_transport().open_session()
+            chan.exec_command(command)
+            chan.settimeout(None)
             
-            # Stream output in real-time
+            # Stream stdout in real-time while draining stderr so the remote
+            # side never stalls on a full stderr window
+            pending, error_chunks = b"", []
             while True:
-                line = stdout.readline()
-                if not line:
+                select.select([chan], [], [], 1.0)
+                while chan.recv_stderr_ready():
+                    error_chunks.append(chan.recv_stderr(1 << 16))
+                if chan.recv_ready():
+                    pending += chan.recv(1 << 16)
+                    *lines, pending = pending.split(b"\n")
+                    for line in lines:
+                        console.print(line.decode(errors="replace").strip())
+                elif chan.exit_status_ready() and not chan.recv_stderr_ready():
                     break
-                console.print(line.strip())
+            if pending:
+                console.print(pending.decode(errors="replace").strip())
             
-            exit_status = stdout.channel.recv_exit_status()
+            exit_status = chan.recv_exit_status()
             
             if exit_status != 0:
-                error_output = stderr.read().decode()
+                error_output = b"".join(error_chunks).decode(errors="replace")
                 console.print(f"[red]Download failed: {error_output}[/red]")
                 return False
     else:
-        stdout, stderr, exit_status = execute_remote_command(client, command)
+        stdout, stderr, exit_status = execute_remote_command(client, command, timeout=None)
         
         if exit_status != 0:
             console.print(f"[red]Download failed: {stderr}[/red]")
@@ -182,19 +263,20 @@ def display_config(config: Dict[str, Any]):
     table.add_column("Option", style="cyan")
     table.add_column("Value", style="green")
     
-    def flatten_dict(d: Dict[str, Any], parent_key: str = '') -> Dict[str, str]:
+    def flatten_dict(d: Dict[str, Any]) -> List[Tuple[str, str]]:
         """Flatten nested dictionary for display"""
-        items = []
-        for k, v in d.items():
-            new_key = f"{parent_key}.{k}" if parent_key else k
-            if isinstance(v, dict):
-                items.extend(flatten_dict(v, new_key).items())
-            else:
-                items.append((new_key, str(v)))
-        return dict(items)
+        items, stack = [], [('', d)]
+        while stack:
+            parent_key, current = stack.pop()
+            for k, v in current.items():
+                new_key = f"{parent_key}.{k}" if parent_key else k
+                if isinstance(v, dict):
+                    stack.append((new_key, v))
+                else:
+                    items.append((new_key, str(v)))
+        return items
     
-    flat_config = flatten_dict(config)
-    for key, value in sorted(flat_config.items()):
+    for key, value in sorted(flatten_dict(config)):
         table.add_row(key, value)
     
     console.print(table)
@@ -254,10 +336,10 @@ def main(server: str, tidal_url: Optional[str], username: Optional[str], port: i
         # Apply configuration changes if any
         if config:
             console.print("\n[yellow]Applying configuration changes...[/yellow]")
-            for key_name, value in config:
-                if not dry_run:
-                    set_tidal_config(client, key_name, value)
-                else:
+            if not dry_run:
+                set_tidal_configs(client, list(config))
+            else:
+                for key_name, value in config:
                     console.print(f"[dim]Would set {key_name} = {value}[/dim]")
         
         # Show current configuration if requested
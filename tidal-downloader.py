@@ -21,8 +21,11 @@ import sys
 import os
 import re
 import json
+import select
 import subprocess
+import shutil
 import getpass
+import functools
 from pathlib import Path
 from typing import Optional, Dict, Any, Tuple, List
 
@@ -32,8 +35,13 @@ SSH_CONFIG = {
     "user": None,  # Will use current user if not set
     "port": 22,
     "key_path": None,  # e.g., "~/.ssh/id_rsa"
+    "control_path": "~/.ssh/tdl-%C",  # Shared connection socket (ssh expands ~); None to disable
+    "control_persist": "10m",  # How long the shared connection stays open when idle
 }
 
+# Resolved once per run instead of on every SSH command
+_HAS_SSHPASS = shutil.which("sshpass") is not None
+
 # ANSI color codes for better output
 class Colors:
     BLUE = '\033[94m'
@@ -57,27 +65,32 @@ def print_header():
     print_colored(f"📡 Server: {SSH_CONFIG['host']}", Colors.BLUE)
     print("─" * 50)
 
+# Single precompiled pattern covering every supported Tidal media type
+_TIDAL_RE = re.compile(
+    r'tidal\.com/(?:browse/)?'
+    r'(?:(track|album|video|artist)/(\d+)|playlist/([a-zA-Z0-9-]+))'
+)
+
 def parse_tidal_url(url: str) -> Tuple[str, str]:
     """Extract type and ID from Tidal URL"""
-    patterns = {
-        'track': r'tidal\.com/(?:browse/)?track/(\d+)',
-        'album': r'tidal\.com/(?:browse/)?album/(\d+)',
-        'playlist': r'tidal\.com/(?:browse/)?playlist/([a-zA-Z0-9-]+)',
-        'video': r'tidal\.com/(?:browse/)?video/(\d+)',
-        'artist': r'tidal\.com/(?:browse/)?artist/(\d+)',
-    }
-    
-    for media_type, pattern in patterns.items():
-        match = re.search(pattern, url)
-        if match:
-            return media_type, match.group(1)
+    match = _TIDAL_RE.search(url)
+    if match:
+        if match.group(1):
+            return match.group(1), match.group(2)
+        return 'playlist', match.group(3)
     
     if url.isdigit():
         return 'track', url
     
     raise ValueError(f"Could not parse Tidal URL: {url}")
 
-def build_ssh_command(command: str, password: Optional[str] = None) -> List[str]:
+@functools.cache
+def local_user() -> str:
+    """Return the local username, looked up only when first needed"""
+    return getpass.getuser()
+
+def build_ssh_command(command: str, password: Optional[str] = None,
+                      multiplex: bool = True) -> List[str]:
     """Build SSH command with proper parameters"""
     if password:
         # Use sshpass for password authentication
@@ -92,17 +105,34 @@ def build_ssh_command(command: str, password: Optional[str] = None) -> List[str]
         "-q"  # Quiet mode
     ])
     
+    # Multiplex over one master connection; callers retry with
+    # multiplex=False if ssh fails (e.g. the control socket cannot be created)
+    if multiplex and SSH_CONFIG["control_path"]:
+        ssh_cmd.extend([
+            "-o", "ControlMaster=auto",
+            "-o", f"ControlPath={SSH_CONFIG['control_path']}",
+            "-o", f"ControlPersist={SSH_CONFIG['control_persist']}",
+        ])
+    
     if SSH_CONFIG["key_path"] and not password:
         ssh_cmd.extend(["-i", str(Path(SSH_CONFIG["key_path"]).expanduser())])
     
     ssh_cmd.extend(["-p", str(SSH_CONFIG["port"])])
     
-    user = SSH_CONFIG["user"] or getpass.getuser()
+    user = SSH_CONFIG["user"] or local_user()
     ssh_cmd.append(f"{user}@{SSH_CONFIG['host']}")
     ssh_cmd.append(command)
     
     return ssh_cmd
 
+def ensure_sshpass():
+    """Install sshpass via Homebrew the first time it is needed"""
+    global _HAS_SSHPASS
+    if not _HAS_SSHPASS:
+        print_colored("⚠️  sshpass not found. Installing via Homebrew...", Colors.YELLOW)
+        subprocess.run(["brew", "install", "sshpass"], check=True)
+        _HAS_SSHPASS = True
+
 def execute_ssh_command(command: str, password: Optional[str] = None, 
                        timeout: int = 300) -> Tuple[str, str, int]:
     """Execute command on remote server via SSH"""
@@ -110,12 +140,16 @@ def execute_ssh_command(command: str, password: Optional[str] = None,
         ssh_cmd = build_ssh_command(command, password)
         
         # Check if sshpass is needed but not available
-        if password and not subprocess.run(["which", "sshpass"], 
-                                         capture_output=True).returncode == 0:
-            print_colored("⚠️  sshpass not found. Installing via Homebrew...", Colors.YELLOW)
-            subprocess.run(["brew", "install", "sshpass"], check=True)
+        if password:
+            ensure_sshpass()
         
         result = subprocess.run(ssh_cmd, capture_output=True, text=True, timeout=timeout)
+        
+        # ssh exits with 255 on its own errors, including an unusable control socket
+        if result.returncode == 255 and SSH_CONFIG["control_path"]:
+            ssh_cmd = build_ssh_command(command, password, multiplex=False)
+            result = subprocess.run(ssh_cmd, capture_output=True, text=True, timeout=timeout)
+        
         return result.stdout, result.stderr, result.returncode
         
     except subprocess.TimeoutExpired:
@@ -156,6 +190,36 @@ def display_config(config: Dict[str, Any], indent: int = 0):
         else:
             print("  " * indent + f"{Colors.CYAN}{key}:{Colors.RESET} {value}")
 
+def stream_ssh_command(ssh_cmd: List[str]) -> Tuple[int, str, bool]:
+    """Run an SSH command, printing stdout live; return (exit code, stderr, printed anything)"""
+    process = subprocess.Popen(ssh_cmd, stdout=subprocess.PIPE, 
+                             stderr=subprocess.PIPE)
+    
+    # Stream stdout while draining stderr so neither pipe can fill up
+    out_fd, err_fd = process.stdout.fileno(), process.stderr.fileno()
+    open_fds = [out_fd, err_fd]
+    pending, stderr_chunks = b"", []
+    produced_output = False
+    while open_fds:
+        ready, _, _ = select.select(open_fds, [], [])
+        for fd in ready:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                open_fds.remove(fd)
+            elif fd == out_fd:
+                produced_output = True
+                pending += chunk
+                *lines, pending = pending.split(b"\n")
+                for line in lines:
+                    print(line.decode(errors="replace").strip())
+            else:
+                stderr_chunks.append(chunk)
+    if pending:
+        print(pending.decode(errors="replace").strip())
+    
+    exit_code = process.wait()
+    return exit_code, b"".join(stderr_chunks).decode(errors="replace"), produced_output
+
 def download_tidal_content(url: str, password: Optional[str] = None) -> bool:
     """Download Tidal content using tidal-dl-ng"""
     try:
@@ -168,28 +232,18 @@ def download_tidal_content(url: str, password: Optional[str] = None) -> bool:
     print_colored("\n⬇️  Starting download...", Colors.YELLOW)
     cmd = f'tidal-dl-ng dl "{url}"'
     
-    # Execute with real-time output
-    ssh_cmd = build_ssh_command(cmd, password)
-    
     try:
-        process = subprocess.Popen(ssh_cmd, stdout=subprocess.PIPE, 
-                                 stderr=subprocess.PIPE, text=True)
-        
-        # Stream output
-        while True:
-            output = process.stdout.readline()
-            if output == '' and process.poll() is not None:
-                break
-            if output:
-                print(output.strip())
+        exit_code, stderr, produced_output = stream_ssh_command(build_ssh_command(cmd, password))
         
-        exit_code = process.poll()
+        # ssh exits with 255 on its own errors, including an unusable control socket
+        if exit_code == 255 and not produced_output and SSH_CONFIG["control_path"]:
+            exit_code, stderr, _ = stream_ssh_command(
+                build_ssh_command(cmd, password, multiplex=False))
         
         if exit_code == 0:
             print_colored("\n✅ Download completed successfully!", Colors.GREEN)
             return True
         else:
-            stderr = process.stderr.read()
             print_colored(f"\n❌ Download failed: {stderr}", Colors.RED)
             return False
             